@@ -25,6 +25,34 @@
 import functools
 import inspect
 import json
+import operator
+import os
+import sys
+import types
+import weakref
+
+# JSON is parsed with the json module unless JSXN_ORJSON is set in the
+# environment and orjson is installed. orjson reads integers outside of the
+# 64-bit range as floats, so it is opt-in. It only accepts exact strings and
+# rejects NaN and Infinity, those inputs are handed to the json module.
+# String representations always use the json module.
+_loads = json.loads
+if os.environ.get('JSXN_ORJSON'):
+    try:
+        import orjson
+    except ImportError:
+        pass
+    else:
+        def _loads(value):
+            try:
+                return orjson.loads(value)
+            except orjson.JSONDecodeError:
+                return json.loads(value)
+
+# Encode with a prebuilt encoder. json.dumps with the default arguments ends
+# up in the same encoder, but checks its keyword arguments on every call. The
+# settings are the same for every jsxn class so one encoder is shared.
+_dumps = json.JSONEncoder().encode
 
 __all__ = ['jsxn']
 
@@ -33,24 +61,25 @@ class _Jsxn:
     # required for the derived class to be also be slotted
     __slots__ = []
 
-    def __init__(self, *args, **kwds):
+    def __init__(self, arg=None, /, **kwds):
         # Call the instance with the passed arguments.
-        self(*args, **kwds)
+        self(arg, **kwds)
         # Support partial initialization by setting undefined fields to null.
         for attr in self.__slots__:
             if not hasattr(self, attr):
                 setattr(self, attr, None)
 
-    def __call__(self, *args, **kwds):
+    def __call__(self, arg=None, /, **kwds):
         # Calling jsxn instances accepts a variety of types. This block assigns
         # values to the attributes based on the type of arguments passed in.
-        if not args:
-            args = kwds
-        else:
-            args = args[0]
-        if isinstance(args, str):
-            args = json.loads(args)
-        if isinstance(args, dict):
+        # The positional argument takes precedence over keywords.
+        args = kwds if arg is None else arg
+        # Exact type checks come first since a plain dict is the common case.
+        kind = type(args)
+        if kind is not dict and isinstance(args, str):
+            args = _loads(args)
+            kind = type(args)
+        if kind is dict or isinstance(args, dict):
             for key,value in args.items():
                 setattr(self, key, value)
         elif isinstance(args, _Jsxn):
@@ -58,8 +87,8 @@ class _Jsxn:
                 setattr(self, key, value)
         elif inspect.isclass(args):
             pass
-        elif not isinstance(args, list):
-            raise TypeError('Invalid type') from None
+        elif kind is not list and not isinstance(args, list):
+            raise TypeError('Invalid type')
 
     # Support access attributes via indices.
     def __getitem__(self, name):
@@ -78,63 +107,317 @@ class _Jsxn:
 
     # Use JSON for string representations of the jsxn instance.
     def __str__(self):
-        return json.dumps(dict(self))
-
-
-# The _Cache class is used to hold the generated classes. It is defined outside
-# of _JsxnFactory in order to reduce the potential for any name collisions with
-# the names used by consumers of the library.
-class _Cache(dict):
-    def generate(self, _name_for_jsxn_class, *args, **kwds):
-        # Creation of jsxn classes accepts a variety of types when specifying
-        # the schema of the class. This block derives the slots based on
-        # the arguments passed in.
-        inherit = [_Jsxn,]
-        if _name_for_jsxn_class in self:
-            inherit.append(self[_name_for_jsxn_class])
-
-        if not args:
-            slots = kwds
-        else:
-            slots = args[0]
-        if isinstance(slots, str):
-            slots = json.loads(slots)
-        if isinstance(slots, dict):
-            slots = tuple(slots.keys())
-        elif hasattr(slots, '__slots__'):
-            slots = slots.__slots__
-        elif hasattr(slots, '__annotations__'):
-            slots = tuple(slots.__annotations__.keys())
-        elif not isinstance(slots, list):
-            raise TypeError('Invalid type') from None
+        return _dumps(dict(self))
+
+
+# Each generated jsxn class gets its own straight-line methods. The source of a
+# method is compiled once per number of slots with placeholder attribute names
+# and the placeholders are swapped for the real slot names in a copy of the
+# code object. Classes with the same number of fields share the compiled
+# template and names supplied by consumers never pass through exec.
+def _init_source(fields):
+    # Set every field to null before calling the instance with the arguments.
+    lines = ['def __init__(self, arg=None, /, **kwds):']
+    for field in fields:
+        lines.append('    self.%s = None' % field)
+    lines.append('    self(arg, **kwds)')
+    return '\n'.join(lines)
+
+# Marks fields that are absent from the dictionary passed to __call__.
+_missing = object()
+
+def _call_source(fields):
+    # Same dispatch as _Jsxn.__call__ but dictionaries assign the known fields
+    # directly. The values are counted before anything is stored. If there are
+    # unknown keys, found with the frozenset of fields that replaces the
+    # '_fields_' placeholder, they are checked first so the instance is left
+    # untouched when one can't be set. Otherwise every item is assigned in
+    # order with setattr so they reach the __dict__ or property setters of a
+    # bound class.
+    lines = [
+        'def __call__(self, arg=None, /, **kwds):',
+        '    args = kwds if arg is None else arg',
+        '    kind = type(args)',
+        '    if kind is not dict and isinstance(args, str):',
+        '        args = _loads(args)',
+        '        kind = type(args)',
+        '    if kind is dict or isinstance(args, dict):',
+        '        missing = _missing',
+        '        found = 0',
+        ]
+    for idx,field in enumerate(fields):
+        lines.append('        value_%d = args.get(%r, missing)' % (idx, field))
+        lines.append('        if value_%d is not missing:' % idx)
+        lines.append('            found += 1')
+    lines.append('        if found == len(args):')
+    for idx,field in enumerate(fields):
+        lines.append('            if value_%d is not missing:' % idx)
+        lines.append('                self.%s = value_%d' % (field, idx))
+    lines += [
+        '            return',
+        "        unknown = args.keys() - '_fields_'",
+        "        if not hasattr(self, '__dict__'):",
+        '            cls = type(self)',
+        '            for key in args:',
+        '                if key not in unknown:',
+        '                    continue',
+        "                if not hasattr(getattr(cls, key, None), '__set__'):",
+        "                    raise AttributeError(\"'%s' object has no attribute '%s'\"",
+        '                                         % (cls.__name__, key))',
+        '        for key,value in args.items():',
+        '            setattr(self, key, value)',
+        '    elif isinstance(args, _Jsxn):',
+        '        for key,value in args:',
+        '            setattr(self, key, value)',
+        '    elif inspect.isclass(args):',
+        '        pass',
+        '    elif kind is not list and not isinstance(args, list):',
+        "        raise TypeError('Invalid type')",
+        ]
+    return '\n'.join(lines)
+
+def _str_source(fields):
+    # Serialize a dictionary display of the fields instead of dict(self). The
+    # encoder is bound as a default argument to skip the global lookup.
+    lines = ['def __str__(self, _dumps=_dumps):', '    return _dumps({']
+    for field in fields:
+        lines.append('        %r : self.%s,' % (field, field))
+    lines.append('        })')
+    return '\n'.join(lines)
+
+def _records_source(fields):
+    # Bulk constructor that bypasses __init__ and __call__ entirely. Each
+    # record must be a dictionary, only the known fields are read so other
+    # keys are ignored rather than raising, and the fields are stored directly
+    # so property setters of a bound class are not called.
+    lines = [
+        'def from_records(cls, records):',
+        '    new = cls.__new__',
+        '    instances = []',
+        '    append = instances.append',
+        '    for record in records:',
+        '        self = new(cls)',
+        ]
+    for field in fields:
+        lines.append('        self.%s = record.get(%r)' % (field, field))
+    lines += [
+        '        append(self)',
+        '    return instances',
+        ]
+    return '\n'.join(lines)
+
+_sources = {
+    '__init__'     : _init_source,
+    '__call__'     : _call_source,
+    '__str__'      : _str_source,
+    'from_records' : _records_source,
+    }
+
+_templates = {}
+
+def _placeholders(count):
+    return tuple('_field_%d' % idx for idx in range(count))
+
+def _template(method, count):
+    key = (method, count)
+    try:
+        return _templates[key]
+    except KeyError:
+        pass
+    # Only placeholder names are in the source so it is safe to execute.
+    namespace = {}
+    source = _sources[method](_placeholders(count))
+    exec(compile(source, '<jsxn %s>' % method, 'exec'), globals(), namespace)
+    template = _templates[key] = namespace[method]
+    return template
+
+def _method(method, slots):
+    template = _template(method, len(slots))
+    names = dict(zip(_placeholders(len(slots)), slots))
+    names['_fields_'] = frozenset(slots)
+    def rename(value):
+        if isinstance(value, str):
+            return names.get(value, value)
+        # Constant dictionary keys are stored as a tuple.
+        if isinstance(value, tuple):
+            return tuple(rename(item) for item in value)
+        return value
+    code = template.__code__
+    code = code.replace(
+        co_names  = tuple(rename(name) for name in code.co_names),
+        co_consts = tuple(rename(const) for const in code.co_consts),
+        )
+    return types.FunctionType(code, globals(), None, template.__defaults__)
+
+# dict(instance) pairs the slot names with every value fetched by a single
+# attrgetter call. The getter is kept in the closure rather than on the class
+# where it could collide with a field name.
+def _iterator(slots):
+    if len(slots) > 1:
+        getall = operator.attrgetter(*slots)
+    elif slots:
+        getone = operator.attrgetter(*slots)
+        def getall(self):
+            return (getone(self),)
+    else:
+        def getall(self):
+            return ()
+    def __iter__(self):
+        return zip(slots, getall(self))
+    return __iter__
+
+
+# Slot tuples are interned so classes with the same fields share one tuple
+# and one set of generated methods. The interned tuples are never released
+# which makes their id() a stable key for the methods.
+_interned = {}
+_generated = {}
 
-        # Create the derived jsxn class.
-        cls = type(_name_for_jsxn_class, tuple(inherit), {'__slots__':slots})
+def _intern(slots):
+    slots = tuple(slots)
+    return _interned.setdefault(slots, slots)
 
-        # Cache the jsxn class.
-        self[_name_for_jsxn_class] = cls
+def _methods(slots):
+    try:
+        return _generated[id(slots)]
+    except KeyError:
+        pass
+    methods = {method:_method(method, slots) for method in _sources}
+    methods['__iter__'] = _iterator(slots)
+    _generated[id(slots)] = methods
+    return methods
 
-        # Instantiate the class and return the instance.
-        return cls(*args, **kwds)
 
-# Instantiate the cache dictionary.
-_cache = _Cache()
+# The generated classes are held in a plain dictionary with module level
+# functions rather than methods on _JsxnFactory in order to reduce the
+# potential for any name collisions with the names used by consumers of the
+# library.
+_cache = {}
+
+# Generated classes keyed by name, bases and slots. The references are weak so
+# deleting a jsxn class still lets it be freed, but while it is alive, for
+# example through its instances, redefining the name with the same schema
+# returns the same class instead of building a new type.
+_classes = weakref.WeakValueDictionary()
+
+# Schemas registered with jsxn(name, schema) whose classes are only generated
+# the first time the name is accessed.
+_pending = {}
+
+# The parameters are positional only so the keywords can use any field name.
+def _create(name, arg=None, /, **kwds):
+    # The class may have been defined or registered since this function was
+    # curried.
+    if name in _cache:
+        return _cache[name](arg, **kwds)
+    if name in _pending:
+        return _promote(name)(arg, **kwds)
+
+    # Create the jsxn class, then instantiate it and return the instance.
+    cls = _generate(name, (_Jsxn,), _schema(arg, kwds))
+    return cls(arg, **kwds)
+
+def _promote(name):
+    # _generate drops the registration once the class exists, so an invalid
+    # schema stays registered and raises again on the next access.
+    arg, kwds = _pending[name]
+    return _generate(name, (_Jsxn,), _schema(arg, kwds))
+
+def _schema(arg, kwds):
+    # Creation of jsxn classes accepts a variety of types when specifying
+    # the schema of the class. This block derives the slots based on
+    # the arguments passed in.
+    slots = kwds if arg is None else arg
+    if isinstance(slots, str):
+        slots = _loads(slots)
+    if isinstance(slots, dict):
+        slots = tuple(slots.keys())
+    elif hasattr(slots, '__slots__'):
+        slots = slots.__slots__
+    elif hasattr(slots, '__annotations__'):
+        slots = tuple(slots.__annotations__.keys())
+    elif not isinstance(slots, list):
+        raise TypeError('Invalid type')
+    return slots
+
+def _generate(name, bases, slots):
+    # A single slot may be given as a plain string.
+    if isinstance(slots, str):
+        slots = (slots,)
+    slots = _intern(slots)
+
+    # Reuse a previously generated class with the same fingerprint,
+    # otherwise create the derived jsxn class.
+    key = (name, bases, slots)
+    cls = _classes.get(key)
+    if cls is None:
+        cls = type(name, bases, {'__slots__':slots})
+        # The slots are validated by type() so attach the generated
+        # methods afterwards.
+        methods = _methods(slots)
+        for method in ('__init__', '__call__', '__str__', '__iter__'):
+            setattr(cls, method, methods[method])
+        # Don't shadow a field or a method of the bound class.
+        if not hasattr(cls, 'from_records'):
+            cls.from_records = classmethod(methods['from_records'])
+        _classes[key] = cls
+
+    # Cache the jsxn class under the interned name so lookups with names from
+    # attribute access match by identity.
+    if type(name) is str:
+        name = sys.intern(name)
+    _cache[name] = cls
+    # A defined class supersedes a registered schema.
+    _pending.pop(name, None)
+    return cls
+
+
+# Curried _create functions for names that are not jsxn classes yet.
+# Repeated access to an undefined name returns the same partial object.
+@functools.lru_cache(maxsize=256)
+def _generator(name):
+    return functools.partial(_create, name)
+
+def _lookup(name):
+    try:
+        return _cache[name]
+    except KeyError:
+        pass
+    if name in _pending:
+        return _promote(name)
+    return _generator(name)
 
 
 # _JsxnFactory manages the creation and access to jsxn classes. When a derived
 # class is accessed it will return the cached jsxn class. If the jsxn class has
-# not been defined it will return a curried _Cache.generate function with the
+# not been defined it will return a curried _create function with the
 # attribute name bound as the first argument
 class _JsxnFactory:
-    # Let the instance be a decorator function.
-    def __call__(self, arg=None):
+    # Let the instance be a decorator function. Passing a schema along with
+    # the name registers the class without generating it.
+    def __call__(self, arg=None, schema=None, /, **kwds):
+        if isinstance(arg, str) and (schema is not None or kwds):
+            # Like generated classes, a defined name must be deleted first.
+            if arg in _cache:
+                raise ValueError('%s is already defined' % arg)
+            _pending[arg] = (schema, kwds)
+            return
+
         # Helpher function to inject a class into an existing jsnx class.
         def inject(name, cls):
+            # A registered schema is defined first so it is extended like any
+            # other jsxn class.
+            if name in _pending:
+                _promote(name)
             if name in _cache:
+                # Extend the existing jsxn class keeping its fields.
                 og = _cache[name]
-                cls = type(name, (og,cls), {'__slots__':og.__slots__})
-            _cache[name] = cls
-            _cache.generate(name, cls)
+                _generate(name, (og,cls), og.__slots__)
+            elif hasattr(cls, '__slots__'):
+                _generate(name, (_Jsxn,cls), cls.__slots__)
+            else:
+                slots = getattr(cls, '__annotations__', {}).keys()
+                _generate(name, (_Jsxn,cls), slots)
             return cls
 
         # If a string is passed in use that as the name.
@@ -153,25 +436,25 @@ class _JsxnFactory:
         raise TypeError(arg)
 
     def __getattr__(self, name):
-        return self[name]
+        # Introspection probes for special names, don't treat them as classes.
+        if name.startswith('__') and name.endswith('__'):
+            raise AttributeError(name)
+        return _lookup(name)
 
     def __getitem__(self, name):
-        try:
-            cls = _cache[name]
-            if not issubclass(cls, _Jsxn):
-                raise KeyError(name)
-            return cls
-        except KeyError:
-            return functools.partial(_cache.generate, name)
+        return _lookup(name)
 
     def __delattr__(self, name):
         try:
-            del _cache[name]
+            self.__delitem__(name)
         except KeyError:
             raise AttributeError(name) from None
 
     def __delitem__(self, name):
-        del _cache[name]
+        if name in _pending:
+            del _pending[name]
+        else:
+            del _cache[name]
 
 # This is the way to access the jsxn library.
 jsxn = _JsxnFactory()
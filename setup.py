@@ -16,6 +16,9 @@ setup(
     long_description_content_type = 'text/markdown',
     url              = 'https://github.com/shawcx/jsxn',
     py_modules = ['jsxn'],
+    extras_require = {
+        'fast' : ['orjson'],
+        },
     classifiers=[
         'Development Status :: 4 - Beta',
         'License :: OSI Approved :: MIT License',
@@ -35,3 +35,13 @@ print(z)
 z.two = 100
 print(dict(z))
 z.hello()
+
+
+rows = [{'radio':3,'rig':'c'},{'radio':4,'output':'speaker'}]
+for r in jsxn.radios.from_records(rows):
+    r.save()
+
+jsxn('station', ['call','grid'])
+s = jsxn.station(call='W1AW')
+print(s)
+print(jsxn.station.from_records([{'grid':'FN31'}])[0])